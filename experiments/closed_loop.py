@@ -0,0 +1,37 @@
+import numpy as np
+import casadi as ca
+from time import perf_counter
+from simulation_tools.integrators import RKSimulator
+
+
+# test case shared by the closed loop sweeps
+x1z1 = {
+    "x0": [1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0],
+    "xr": [0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0],
+    "num_iterations": 250,
+    "title": "x1z1"
+}
+
+
+# Runs the nmpc in a closed loop with an RK4 simulation of f as the plant.
+# Returns the simulated states, the time every make_step call took and the
+# number of solves that did not succeed. Failed solves are only counted when
+# the nmpc records its NLP stats.
+def run_closed_loop(nmpc, f, x0, params, num_iterations):
+    rk_sim = RKSimulator(0.005, 4)
+
+    state_data = np.empty([num_iterations, 13])
+    time_data = []
+    fails = 0
+    x0 = ca.DM(x0)
+    u0 = np.zeros(4)
+    for k in range(num_iterations):
+        start_time = perf_counter()
+        u0 = nmpc.make_step(x0, u0, params)
+        time_data.append(perf_counter() - start_time)
+        x0 = rk_sim.make_step(f, x0, u0, params)
+        state_data[k] = np.reshape(x0, (13,))
+        if nmpc.record_nlp_stats and not nmpc.solver_stats['status'] == 'Solve_Succeeded':
+            fails += 1
+
+    return state_data, time_data, fails
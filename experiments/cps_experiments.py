@@ -4,7 +4,7 @@
 #
 
 
-from hop.constants import Constants
+from hop.constants import get_constants
 
 
 import casadi as ca
@@ -19,7 +19,7 @@ from simulation_tools.integrators import RKSimulator
 from plotting.plots import plot_comparison, plot_state_for_paper, plot_control_for_paper
 
 
-mc = Constants()
+mc = get_constants()
 model = Equations6DOF(mc)
 
 # If you just want to run a single test you can loop over this list
@@ -122,7 +122,7 @@ for test in test_list_for_paper:
 
             # Propagate the system using the discrete dynamics f
             # runge kutta 4 simulator
-            x0 = rk_sim.make_step(model.f, x0, u0, params)  
+            x0 = rk_sim.make_step(model.f_compiled, x0, u0, params)  
 
             
             state_data[k] = np.reshape(x0, (13,))
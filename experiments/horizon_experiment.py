@@ -0,0 +1,60 @@
+#
+# This sweeps the number of multiple shooter intervals at the control rate.
+# Short horizons solve fast but settle slowly, long horizons settle well but
+# take longer per solve. The horizon with the smallest
+# (mean step time) x (settling time) product is reported as the best choice
+# for mc.mpc_horizon. Horizons that never settle get an infinite score.
+#
+from hop.constants import get_constants
+
+import numpy as np
+import statistics as stats
+from hop.equations_of_motion import Equations6DOF
+from hop.multiShooting import DroneNMPCMultiShoot
+from experiments.trajectory_metrics import settling_metric
+from experiments.closed_loop import x1z1, run_closed_loop
+
+mc = get_constants()
+
+# JIT would compile a new solver for every horizon, which takes longer than the sweep itself
+mc.jit = False
+equations = Equations6DOF(mc)
+
+test = x1z1
+
+horizons = [20, 40, 60, 100]
+
+xr = np.array(test['xr'])
+allowed_error = np.array([0.05,0.05,0.05, 0.02,0.02,0.02, 0.02,0.02,0.02,0.02, 0.01,0.01,0.01])
+goal_ul = xr + allowed_error
+goal_ll = xr - allowed_error
+params = np.array([xr[0], xr[1], xr[2], mc.battery_v, mc.hover_thrust])
+
+print(test['title'])
+s = ["{: >15} ".format(p) for p in ['N', 'mean', 'max', 'settle', 'score']]
+print(''.join(s))
+print("--------------------------------------------------------------------------------")
+
+scores = {}
+for N in horizons:
+    # the shooting step matches the control rate so the warm start
+    # can shift the previous solution by one step
+    ms_nmpc = DroneNMPCMultiShoot(equations)
+    ms_nmpc.dt = mc.dt
+    ms_nmpc.N = N
+    ms_nmpc.build_nmpc_instance()
+
+    state_data, time_data, _ = run_closed_loop(ms_nmpc, equations.f_compiled, test['x0'], params, test['num_iterations'])
+
+    # the first solve is a cold start so leave it out of the timing
+    mean_time = stats.mean(time_data[1:])
+
+    # a run that never settles gets an infinite settling time so it can't be picked
+    settle_step = settling_metric(state_data, goal_ll, goal_ul)
+    settle = float('inf') if settle_step == len(state_data) else settle_step * mc.dt
+    scores[N] = mean_time * settle
+    s = ["{: >15} ".format(v) for v in [N, round(mean_time, 4), round(max(time_data[1:]), 4), round(settle, 3), round(scores[N], 5)]]
+    print(''.join(s))
+
+best = min(scores, key=scores.get)
+print('best horizon', best if scores[best] < float('inf') else 'none, no horizon settled')
@@ -0,0 +1,44 @@
+#
+# This compares the linear solvers IPOPT can use on the same closed loop run
+# of the multiple shooter. Every solver gets the same warm started trace.
+#
+from hop.constants import get_constants
+
+import numpy as np
+import statistics as stats
+from hop.equations_of_motion import Equations6DOF
+from hop.multiShooting import DroneNMPCMultiShoot
+from experiments.closed_loop import x1z1, run_closed_loop
+
+mc = get_constants()
+equations = Equations6DOF(mc)
+
+test = x1z1
+
+linear_solvers = ['ma27', 'ma57', 'ma97', 'mumps']
+horizon_time = 1.0
+
+xr = np.array(test['xr'])
+params = np.array([xr[0], xr[1], xr[2], mc.battery_v, mc.hover_thrust])
+
+print(test['title'])
+s = ["{: >15} ".format(p) for p in ['solver', 'mean', 'max', 'fails']]
+print(''.join(s))
+print("-----------------------------------------------------------------")
+
+for solver in linear_solvers:
+    mc.set_linear_solver(solver)
+
+    ms_nmpc = DroneNMPCMultiShoot(equations)
+    ms_nmpc.dt = mc.dt
+    ms_nmpc.N = int(horizon_time / ms_nmpc.dt)
+    ms_nmpc.record_nlp_stats = True
+    ms_nmpc.build_nmpc_instance()
+
+    _, time_data, fails = run_closed_loop(ms_nmpc, equations.f_compiled, test['x0'], params, test['num_iterations'])
+
+    # the first solve is a cold start so leave it out of the timing
+    time_data = time_data[1:]
+    name = solver if mc.linear_solver == solver else solver + '->' + mc.linear_solver
+    s = ["{: >15} ".format(v) for v in [name, round(stats.mean(time_data), 4), round(max(time_data), 4), fails]]
+    print(''.join(s))
@@ -2,7 +2,7 @@
 # This is a set of experiments for tuning the multipleShooting implementation
 #
 
-from hop.constants import Constants
+from hop.constants import get_constants
 
 import casadi as ca
 import numpy as np
@@ -15,7 +15,7 @@ import matplotlib.pyplot as plt
 from plotting.plots import plot_comparison, plot_state_for_paper, plot_control_for_paper
 from simulation_tools.integrators import RKSimulator
 
-mc = Constants()
+mc = get_constants()
 model = Equations6DOF(mc)
 
 # If you just want to run a single test you can loop over this list
@@ -71,7 +71,7 @@ for test in test_list_for_paper:
         u0 = ms_nmpc.make_step(x0, u0, params)
 
         # runge kutta 4 simulator
-        x0 = rk_sim.make_step(model.f, x0, u0, params)
+        x0 = rk_sim.make_step(model.f_compiled, x0, u0, params)
         reference_data[k] = np.reshape(x0, (13,))
 
     # print timing results
@@ -112,7 +112,7 @@ for test in test_list_for_paper:
 
             # Propagate the system using the discrete dynamics f 
             # runge kutta 4 simulator
-            x0 = rk_sim.make_step(model.f, x0, u0, params)  
+            x0 = rk_sim.make_step(model.f_compiled, x0, u0, params)  
 
             state_data[k] = np.reshape(x0, (13,))
             control_data[k] = np.reshape(u0, (4,))
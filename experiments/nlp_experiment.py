@@ -1,10 +1,10 @@
 #
 # This runs drone simulations, plots results and gives timing summaries
 #
-from hop.drone_model import DroneModel
+from hop.drone_model import get_drone_model
 from hop.dompc import DroneNMPCdompc
 from hop.equations_of_motion import Equations6DOF
-from hop.constants import Constants
+from hop.constants import get_constants
 import casadi as ca
 import numpy as np
 import statistics as stats
@@ -16,7 +16,7 @@ import matplotlib.pyplot as plt
 from plotting.plots import plot_comparison, plot_state_for_paper, plot_control_for_paper
 from simulation_tools.integrators import RKSimulator
 
-mc = Constants()
+mc = get_constants()
 equations = Equations6DOF(mc)
 
 # # If you just want to run a single test you can loop over this list
@@ -82,7 +82,7 @@ for test in test_list_for_paper:
     if 'oc' in nlps_to_run:
       # first we set up the do-mpc solver
       # it uses orthagonal collocation
-      model = DroneModel(mc)
+      model = get_drone_model()
       mpc = DroneNMPCdompc(mc.dt, model.model)
 
       mpc.setup_cost()
@@ -97,7 +97,7 @@ for test in test_list_for_paper:
           u0 = mpc.mpc.make_step(x0)
           step_time = perf_counter() - start_time
 
-          x0 = rk_sim.make_step(equations.f, x0, u0, params)
+          x0 = rk_sim.make_step(equations.f_compiled, x0, u0, params)
 
           state_data['oc'][k] = np.reshape(x0, (13,))
           control_data['oc'][k] = np.reshape(u0, (4,))
@@ -128,7 +128,7 @@ for test in test_list_for_paper:
           step_time = perf_counter() - start_time
 
           # Propagate the system using the discrete dynamics f
-          x0 = rk_sim.make_step(equations.f, x0, u0, params)
+          x0 = rk_sim.make_step(equations.f_compiled, x0, u0, params)
 
           state_data['cps'][k] = np.reshape(x0, (13,))
           control_data['cps'][k] = np.reshape(u0, (4,))
@@ -155,7 +155,7 @@ for test in test_list_for_paper:
           step_time = perf_counter() - start_time
 
           # Propagate the system using the discrete dynamics f 
-          x0 = rk_sim.make_step(equations.f, x0, u0, params)
+          x0 = rk_sim.make_step(equations.f_compiled, x0, u0, params)
           
   
           state_data['ms'][k] = np.reshape(x0, (13,))
@@ -5,9 +5,9 @@
 # with the 2D grid corresponding to combinations of number of collocation points
 # and size of intervals
 #
-from hop.drone_model import DroneModel
+from hop.drone_model import get_drone_model
 from hop.dompc import DroneNMPCdompc
-from hop.constants import Constants
+from hop.constants import get_constants
 import casadi as ca
 import numpy as np
 import statistics as stats
@@ -18,7 +18,7 @@ from plotting.plots import plot_comparison, plot_state_for_paper, plot_control_f
 from hop.utilities import sig_figs
 from hop.equations_of_motion import Equations6DOF
 from simulation_tools.integrators import RKSimulator
-mc = Constants()
+mc = get_constants()
 
 equations = Equations6DOF(mc)
 
@@ -73,7 +73,7 @@ for test in test_list:
 
     # run fine grained solver for a reference trajectory
     # the accuracy of other runs are assessed relative to this trajectory
-    model = DroneModel(mc)
+    model = get_drone_model()
     mpc = DroneNMPCdompc(mc.dt, model.model)
 
     horizon_time = 1.2
@@ -95,7 +95,7 @@ for test in test_list:
         step_time = perf_counter() - start_time
 
         # runge kutta 4 simulator
-        x0 = rk_sim.make_step(equations.f, x0, u0, params)
+        x0 = rk_sim.make_step(equations.f_compiled, x0, u0, params)
         reference_data[k] = np.reshape(x0, (13,))
 
                 
@@ -114,7 +114,7 @@ for test in test_list:
 
             # first we set up the do-mpc solver
             # it uses orthagonal collocation
-            model = DroneModel(mc)
+            model = get_drone_model()
             mpc = DroneNMPCdompc(mc.dt, model.model)
 
             mpc.mpc.settings.t_step = tstep
@@ -137,7 +137,7 @@ for test in test_list:
                 step_time = perf_counter() - start_time
 
                 # runge kutta 4 simulator
-                x0 = rk_sim.make_step(equations.f, x0, u0, params)
+                x0 = rk_sim.make_step(equations.f_compiled, x0, u0, params)
 
                 dompc_state_data[k] = np.reshape(x0, (13,))
                 dompc_control_data[k] = np.reshape(u0, (4,))
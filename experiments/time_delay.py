@@ -3,7 +3,7 @@
 # Then look at how different NLP models do with the time delay
 #
 
-from hop.constants import Constants
+from hop.constants import get_constants
 from hop.equations_of_motion import Equations6DOF
 from hop.utilities import  import_data
 import casadi as ca
@@ -23,7 +23,7 @@ from hop.multiShootTDelay import DroneNMPCMultiShootTDelay
 
 
 # first we make a model
-mc = Constants()
+mc = get_constants()
 equations = Equations6DOF(mc)
 
 
@@ -96,7 +96,7 @@ for test in test_list_for_paper:
     state_history = np.tile(x_init, (delay+1,1))
 
     for i in range(1,delay+1):
-        state_history[i] = np.reshape(rk_sim.make_step(equations.f, state_history[i-1], u_history[delay-1], params), (13,))
+        state_history[i] = np.reshape(rk_sim.make_step(equations.f_compiled, state_history[i-1], u_history[delay-1], params), (13,))
 
     # run the simulation
     for k in range(num_iterations):
@@ -119,7 +119,7 @@ for test in test_list_for_paper:
             u_current = u_history[delay-1]
 
         # runge kutta 4 simulator
-        x0 = rk_sim.make_step(equations.f, ca.DM(state_history[delay]), u_current, params)
+        x0 = rk_sim.make_step(equations.f_compiled, ca.DM(state_history[delay]), u_current, params)
 
         state_data[k] = np.reshape(x0, (13,))
         control_data[k] = np.reshape(u_computed, (4,))
@@ -2,7 +2,7 @@
 #
 from hop.drone_model import DroneModel
 from hop.dompc import DroneNMPCdompc
-from hop.constants import Constants
+from hop.constants import get_constants
 from hop.utilities import quaternion_to_angle
 from flight_analysis_tools.flight_data import FlightData
 import casadi as ca
@@ -14,7 +14,7 @@ from plotting.plots import plot_state, plot_control, plot_pwm, plot_attitude, pl
 from hop.equations_of_motion import Equations6DOF
 
 
-mc = Constants()
+mc = get_constants()
 equations = Equations6DOF(mc)
 fd = FlightData()
 
@@ -5,7 +5,7 @@ from hop.drone_model import DroneModel
 from hop.dompc import DroneNMPCdompc
 from flight_analysis_tools.flight_data import FlightData
 # from hop.multiShooting import DroneNMPCMultiShoot
-from hop.constants import Constants
+from hop.constants import get_constants
 from hop.equations_of_motion import Equations6DOF
 from hop.utilities import  import_data
 import casadi as ca
@@ -16,7 +16,7 @@ from plotting.plots import plot_state, plot_control
 
 
 # first we make a model
-mc = Constants()
+mc = get_constants()
 equations = Equations6DOF(mc)
 
 fd = FlightData()
@@ -17,15 +17,22 @@ class DroneNMPCwithCPS:
     # we can't build it until we know the goal state
     def build_nmpc_instance(self):
 
-        X0 = ca.SX.sym('X0', self.size_x())            # initial state
-        U0 = ca.SX.sym('U0', self.size_u())
+        # with the compiled drone_rhs the NLP is built from MX symbols,
+        # SX graphs can't call an external library
+        compiled = self.mc.compiled_nlp_rhs()
+        sym = ca.MX.sym if compiled else ca.SX.sym
+        f = self.E.f_compiled if compiled else self.E.f
 
-        P0 = ca.vertcat(X0, U0, self.E.p)
+        X0 = sym('X0', self.size_x())            # initial state
+        U0 = sym('U0', self.size_u())
+        self.p = sym('parameters', self.E.p.size1())
+
+        P0 = ca.vertcat(X0, U0, self.p)
 
         # we make a copy of the state variables for each N+1 time steps
-        X = ca.SX.sym('X', self.size_x(), self.N+1)   
+        X = sym('X', self.size_x(), self.N+1)   
         # we make a copy of the control variables for each N time steps 
-        U = ca.SX.sym('U', self.size_u(), self.N+1)   
+        U = sym('U', self.size_u(), self.N+1)   
 
         # We make one long list of all the optimization variables
         # all the state variables preceed all the control variables.
@@ -65,8 +72,8 @@ class DroneNMPCwithCPS:
         # cost function
         self.cost = 0.0
 
-        x_r = ca.vertcat(self.E.p[:3], self.mc.xr[3:])
-        u_r = ca.vertcat(0.0, 0.0, self.E.p[4] * self.mc.battery_v / self.E.p[3], 0.0)
+        x_r = ca.vertcat(self.p[:3], self.mc.xr[3:])
+        u_r = ca.vertcat(0.0, 0.0, self.p[4] * self.mc.battery_v / self.p[3], 0.0)
         
         for j in range(self.N + 1):
             x_k = X[:, j]
@@ -79,7 +86,7 @@ class DroneNMPCwithCPS:
             self.cost = self.cost + w[j] * running_cost
 
             # dynamics constraints
-            f_k = self.E.f(x_k, u_k, self.E.p)
+            f_k = f(x_k, u_k, self.p)
             g = ca.vertcat(g, (D_ca[j,:] @ X.T).T - tau_2_time * f_k)
             self.lbg += [0.0]*int(self.size_x())
             self.ubg += [0.0]*int(self.size_x())
@@ -125,7 +132,12 @@ class DroneNMPCwithCPS:
             'p': P0
         }
 
-        self.solver = ca.nlpsol('solver', 'ipopt', nlp_prob, self.mc.ipopt_settings)
+        # the compiled drone_rhs has no SX graph to expand into
+        opts = self.mc.nlpsol_options(f'drone_nlp_cps{self.N}')
+        if compiled:
+            opts['expand'] = False
+
+        self.solver = ca.nlpsol('solver', 'ipopt', nlp_prob, opts)
         
         x_initial_guess = ca.DM([0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0])
         X_init = np.tile(np.array(x_initial_guess).reshape(-1,1), (1, self.N+1))
@@ -135,6 +147,8 @@ class DroneNMPCwithCPS:
         # Here we initialize our stored solution to zeros
         self.sol_x = np.zeros(n_x_vars)
         self.sol_u = np.zeros(n_u_vars)
+        self.lam_x = np.zeros(num_vars)
+        self.lam_g = np.zeros(len(self.lbg))
         self.first_iteration = True
 
 
@@ -158,14 +172,18 @@ class DroneNMPCwithCPS:
             u_pred_flat = S_kron_u @ self.sol_u
             self.init_guess = np.concatenate([x_pred_flat, u_pred_flat])
 
-        sol = self.solver(x0=self.init_guess, lbx=self.lbx, ubx=self.ubx, lbg=self.lbg, ubg=self.ubg, p=x)
+        # the multipliers from the last solve are reused as they are for the dual warm start
+        sol = self.solver(x0=self.init_guess, lam_x0=self.lam_x, lam_g0=self.lam_g,
+                          lbx=self.lbx, ubx=self.ubx, lbg=self.lbg, ubg=self.ubg, p=x)
         sol_opt = sol['x'].full().flatten()
         self.sol_x = sol_opt[:self.size_x() * (self.N+1)]
         self.sol_u = sol_opt[self.size_x() * (self.N+1):]
+        self.lam_x = sol['lam_x'].full().flatten()
+        self.lam_g = sol['lam_g'].full().flatten()
 
         # keep track of some accuracy measures from solving the nlp
         if self.record_nlp_stats:
-            f_fun = ca.Function("f_fun", [self.opt_vars, self.E.p], [self.cost])
+            f_fun = ca.Function("f_fun", [self.opt_vars, self.p], [self.cost])
             cost = float(f_fun(sol_opt, params))
             self.solver_stats = {
                 'status': self.solver.stats()['return_status'], 
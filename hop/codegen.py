@@ -0,0 +1,84 @@
+import os
+import glob
+import shutil
+import hashlib
+import tempfile
+import warnings
+import subprocess
+import casadi as ca
+
+
+# bump when the contents of the generated libraries change so old ones are not loaded
+_CACHE_VERSION = 3
+
+
+# Ahead of time compilation of CasADi functions.
+# The function is turned into C code, compiled into a shared library and
+# loaded back with ca.external. The library name has a hash of the serialized
+# function in it, so we only pay for the compile the first time a model is
+# built and whenever the model or the constants change.
+#
+# The first `derivatives` levels of Jacobians are compiled into the same library.
+# ca.external picks up jac_<name> and jac_jac_<name> by name, so the loaded
+# function keeps exact sparse derivatives, and their sparsity patterns are cached
+# with the library instead of being rebuilt by finite differences.
+#
+# The compiler and flags are part of the hash as well, since they change the
+# library. Every new key adds a library to build_dir, so only the `keep` most
+# recently used libraries of a function are kept and older ones are removed
+# whenever a new one is built.
+def compile_function(f, build_dir, compiler='gcc', flags=('-O3', '-march=native'), derivatives=2, keep=4):
+    key_data = f'{_CACHE_VERSION} {derivatives} {compiler} {" ".join(flags)} ' + f.serialize()
+    key = hashlib.sha1(key_data.encode()).hexdigest()[:12]
+    name = f.name()
+    lib_path = os.path.join(build_dir, f'{name}_{key}.so')
+
+    try:
+        if os.path.exists(lib_path):
+            # touch the library so pruning sees it as recently used
+            os.utime(lib_path)
+        else:
+            _build(f, build_dir, name, key, compiler, flags, derivatives)
+            _prune(build_dir, name, keep)
+        return ca.external(name, lib_path)
+    except (OSError, subprocess.CalledProcessError, RuntimeError) as e:
+        # AOT is only an optimisation, so without a working compiler or a writable
+        # cache we warn and keep evaluating the function in the CasADi virtual machine
+        warnings.warn(f'AOT compilation of {name} failed, using the uncompiled function: {e}')
+        return f
+
+
+# generates the C code and compiles it in a private temporary directory, then
+# moves the files into the cache. Processes that miss the cache on the same key
+# at the same time each build their own copy and os.replace installs whole files only.
+def _build(f, build_dir, name, key, compiler, flags, derivatives):
+    os.makedirs(build_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=build_dir)
+    try:
+        cg = ca.CodeGenerator(f'{name}_{key}.c')
+        g = f
+        cg.add(g)
+        for _ in range(derivatives):
+            g = g.jacobian()
+            cg.add(g)
+        c_path = cg.generate(tmp_dir + os.sep)
+
+        tmp_lib = os.path.join(tmp_dir, f'{name}_{key}.so')
+        subprocess.run([compiler, *flags, '-shared', '-fPIC', c_path, '-o', tmp_lib, '-lm'], check=True)
+        os.replace(c_path, os.path.join(build_dir, f'{name}_{key}.c'))
+        os.replace(tmp_lib, os.path.join(build_dir, f'{name}_{key}.so'))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# removes all but the `keep` most recently used libraries of a function
+# from build_dir, together with their generated C files
+def _prune(build_dir, name, keep):
+    libs = sorted(glob.glob(os.path.join(build_dir, f'{name}_' + '?' * 12 + '.so')), key=os.path.getmtime, reverse=True)
+    for lib in libs[keep:]:
+        for path in (lib, lib[:-3] + '.c'):
+            # another process may be pruning the same cache
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -1,3 +1,6 @@
+import os
+import ctypes.util
+import functools
 import numpy as np
 import casadi as ca
 from hop.utilities import q_component_to_angle
@@ -148,17 +151,28 @@ class Constants:
             np.array([0.0, 0.0, 0.3, 25.0, 0.0]),
         ]
 
-        self.land = np.array([0.0, 0.0, self.px4_height, 23.0])
+        # landing target in the same (x, y, z, voltage, goal thrust) layout as the waypoints
+        self.land = np.array([0.0, 0.0, self.px4_height, 23.0, 0.0])
 
         self.nmpc_rate_constraints = True
 
         # constants for specific NLP formulations
         # --------------------------------------------------------------- 
 
+        # which NLP formulation the NMPC is built with, see hop/nmpc_factory.py
+        # oc - orthogonal collocation by do-mpc
+        # cps - Chebyshev pseudospectral collocation
+        # ms - multiple shooter with Runge-Kutta
+        self.nlp_type = 'oc'
+
         self.horizon_time = 1.0
 
         # multiple shooter constants
         self.ms_time_step = 0.25 # number of timesteps for nmpc to consider
+        self.mpc_horizon = int(self.horizon_time / self.ms_time_step) # number of shooting intervals
+        # how the RK4 step is mapped over the shooting nodes, 'serial' or 'thread'
+        self.ms_map_parallelization = 'serial'
+        self.ms_map_threads = os.cpu_count()
 
         # chebyshev pseudospectral constants
         self.spectral_order = 6
@@ -177,13 +191,83 @@ class Constants:
             'ipopt.print_level': 0,
             'ipopt.sb': 'yes',
             'print_time': 0,
-            'ipopt.linear_solver': 'ma27',
-            # 'ipopt.warm_start_init_point': 'yes',
-            # 'ipopt.warm_start_bound_push': 1e-6,
-            # 'ipopt.warm_start_mult_bound_push': 1e-6,
-            # 'ipopt.mu_init': 1e-3,  
+            'expand': True,                         # expand MX graphs to SX before solving
+            'ipopt.warm_start_init_point': 'yes',   # start from the previous primal and dual solution
+            'ipopt.warm_start_bound_push': 1e-6,
+            'ipopt.warm_start_mult_bound_push': 1e-6,
+            'ipopt.mu_init': 1e-3,
+        }
+
+        # linear solver used inside IPOPT, see set_linear_solver
+        # ma57 is the default, ma27, ma97 and mumps can be swapped in for comparisons
+        self.linear_solver = 'ma57'
+        self.set_linear_solver(self.linear_solver)
+
+        # CasADi JIT settings
+        # compile the NLP functions (cost, constraints and their derivatives) to
+        # native code with gcc instead of running them in the CasADi virtual machine.
+        # -ffast-math is left out on purpose since IPOPT relies on nan/inf checks
+        # to detect failed function evaluations.
+        # Every nlpsol is compiled from scratch when it is built, which takes seconds
+        # for do-mpc and minutes for long multiple shooters, so JIT is off by default.
+        # The flight controller turns it on since it builds its solver once per flight.
+        self.jit = False
+        self.jit_options = {
+            'compiler': 'gcc',
+            'flags': ['-O3', '-march=native'],
+            'verbose': False,
         }
 
+        # AOT settings
+        # the model RHS is generated as C code, compiled once and cached as a
+        # shared library in codegen_dir. Later runs load the cached library.
+        self.aot = True
+        self.aot_flags = ['-O3', '-march=native']
+        self.codegen_dir = os.path.join(os.path.expanduser('~'), '.cache', 'hop')
+        # build the oc and cps NLPs around the compiled drone_rhs instead of inlining
+        # its SX expressions. The NLPs are then MX graphs that call the library at every
+        # collocation node. They build about twice as fast but solve slower, since
+        # every node pays for a library call, so this is off by default.
+        # The multiple shooter always uses its own compiled RK4 step with AOT on.
+        self.aot_nlp_rhs = False
+
+
+    # Selects the linear solver IPOPT uses and the options that go with it.
+    # The HSL solvers need the HSL library to be installed. Without it
+    # we fall back to mumps which always ships with IPOPT.
+    def set_linear_solver(self, solver):
+        if solver in ('ma27', 'ma57', 'ma97') and not hsl_available():
+            solver = 'mumps'
+        for options in LINEAR_SOLVER_OPTIONS.values():
+            for key in options:
+                self.ipopt_settings.pop(key, None)
+        self.linear_solver = solver
+        self.ipopt_settings['ipopt.linear_solver'] = solver
+        self.ipopt_settings.update(LINEAR_SOLVER_OPTIONS[solver])
+
+
+    # The nlpsol options for one solver, the IPOPT settings plus the JIT options
+    # when JIT is on. Each solver passes its own name as jit_name and keeps the
+    # temporary suffix, so two solvers never write the same C file and CasADi
+    # removes the generated files again once they are compiled.
+    def nlpsol_options(self, name):
+        opts = dict(self.ipopt_settings)
+        if self.jit:
+            opts.update({
+                'jit': True,
+                'compiler': 'shell',
+                'jit_name': name,
+                'jit_temp_suffix': True,
+                'jit_options': self.jit_options,
+            })
+        return opts
+
+
+    # True when the collocation NLPs should call the compiled drone_rhs.
+    # JIT compiles the whole NLP and cannot link against the cached library.
+    def compiled_nlp_rhs(self):
+        return self.aot and self.aot_nlp_rhs and not self.jit
+
 
     def tuning_info(self):
         s = 'Q Tuning Information\n'
@@ -261,68 +345,98 @@ class Constants:
         self.ur = ca.DM(mcd['ur'])
         self.moment_arm = np.array(mcd['moment_arm'])
         self.I = np.array(mcd['I'])
+        self.I_inv = np.linalg.inv(self.I)
         self.ipopt_settings = mcd['ipopt_settings']
 
     # This function makes it possible to print the Constants with print function
     # This way we can add our constants to our runs and simulation logs.
     def __repr__(self):
-        s = 'Constants \n' + '---------------------\n'
-        s += 'General constants: \n'
-        s += '-----------------------------------------------\n'
-        s += f"{'flight time:':15}  {str(self.timelimit):15}\n"
-        s += 'Model related constants: \n'
-        s += '-----------------------------------------------\n'
-        s += f"{'m:':10}  {str(self.m):15}\n"
-        s += f"{'gx:':10}  {str(self.gx):15}\n"
-        s += f"{'gy:':10}  {str(self.gy):15}\n"
-        s += f"{'gz:':10}  {str(self.gz):15}\n"
-        s += f"{'g:':10}  {str(self.g.tolist()):15}\n"
-        s += f"{'Ixx:':10}  {str(self.Ixx):15}\n"
-        s += f"{'Iyy:':10}  {str(self.Iyy):15}\n"
-        s += f"{'Izz:':10}  {str(self.Izz):15}\n"
-        s += f"{'moment arm:':20}  {str(self.moment_arm.tolist())}\n" 
-        s += f"{'I_inv:':20}  {str(self.I_inv.tolist())}\n" 
-        s += 'thrust model constants: \n'
-        s += '-----------------------------------------------\n'        
-        s += f"{'tcc:':10}  {str(self.tcc):15}\n"
-        s += f"{'a:':10}  {str(self.a):15}\n"
-        s += f"{'b:':10}  {str(self.b):15}\n"
-        s += f"{'c:':10}  {str(self.c):15}\n"
-        s += f"{'d:':10}  {str(self.d):15}\n"
-        s += 'Mechanical and hardware constants: \n'
-        s += '-----------------------------------------------\n'
-        s += f"{'outer gimbal range:':20}  {str(self.outer_gimbal_range)}\n" 
-        s += f"{'inner gimbal range:':20}  {str(self.inner_gimbal_range)}\n" 
-        s += f"{'theta dot max:':20}  {str(self.theta_dot_constraint)}\n" 
-        s += f"{'thrust dot max:':20}  {str(self.thrust_dot_limit)}\n" 
-        s += f"{'hover thrust:':20}  {str(self.hover_thrust)}\n" 
-        s += f"{'max thrust:':20}  {str(self.prop_thrust_constraint)}\n" 
-        s += f"{'max diff thrus:':20}  {str(self.diff_thrust_constraint)}\n" 
-        s += 'NMPC constants: \n'
-        s += '-----------------------------------------------\n'
-        s += f"{'dt:':10}  {str(self.dt):15}\n"
-        s += f"{'x0:':10}  {str(self.x0)}\n" 
-        s += f"{'Q:':10}  {str(self.Q)}\n" 
-        s += f"{'R:':10}  {str(self.R)}\n" 
-        s += f"{'xr:':10}  {str(self.xr)}\n"
-        s += f"{'ur:':10}  {str(self.ur)}\n"        
-        s += f"{'waypoints:':20}  {str(self.waypoints):15}\n"   
-        s += f"{'NMPC rate constraints:':20}  {str(self.nmpc_rate_constraints)}\n"  
-        s += 'NLP constants: \n'
-        s += '-----------------------------------------------\n'
-        s += f"{'nmpc horizon:':20}  {str(self.mpc_horizon):15}\n"
-        s += f"{'spectral order:':20}  {str(self.spectral_order):15}\n"
-        s += f"{'size of intervals:':20}  {str(self.finite_interval_size):15}\n"
-        s += f"{'num intervals:':20}  {str(self.number_intervals):15}\n"
-        s += f"{'collocation deg:':20}  {str(self.collocation_degree):15}\n"
-        s += 'IPOPT settings: \n'
-        s += '-----------------------------------------------\n'
-        s += str(self.ipopt_settings)
+        lines = [
+            'Constants ',
+            '---------------------',
+            'General constants: ',
+            '-----------------------------------------------',
+            _row('flight time:', self.timelimit, 15),
+            'Model related constants: ',
+            '-----------------------------------------------',
+            _row('m:', self.m),
+            _row('gx:', self.gx),
+            _row('gy:', self.gy),
+            _row('gz:', self.gz),
+            _row('g:', self.g.tolist()),
+            _row('Ixx:', self.Ixx),
+            _row('Iyy:', self.Iyy),
+            _row('Izz:', self.Izz),
+            _row('moment arm:', self.moment_arm.tolist(), 20, None),
+            _row('I_inv:', self.I_inv.tolist(), 20, None),
+            'thrust model constants: ',
+            '-----------------------------------------------',
+            _row('tcc:', self.tcc),
+            _row('a:', self.a),
+            _row('b:', self.b),
+            _row('c:', self.c),
+            _row('d:', self.d),
+            'Mechanical and hardware constants: ',
+            '-----------------------------------------------',
+            _row('outer gimbal range:', self.outer_gimbal_range, 20, None),
+            _row('inner gimbal range:', self.inner_gimbal_range, 20, None),
+            _row('theta dot max:', self.theta_dot_constraint, 20, None),
+            _row('thrust dot max:', self.thrust_dot_limit, 20, None),
+            _row('hover thrust:', self.hover_thrust, 20, None),
+            _row('max thrust:', self.prop_thrust_constraint, 20, None),
+            _row('max diff thrus:', self.diff_thrust_constraint, 20, None),
+            'NMPC constants: ',
+            '-----------------------------------------------',
+            _row('dt:', self.dt),
+            _row('x0:', self.x0, 10, None),
+            _row('Q:', self.Q, 10, None),
+            _row('R:', self.R, 10, None),
+            _row('xr:', self.xr, 10, None),
+            _row('ur:', self.ur, 10, None),
+            _row('waypoints:', self.waypoints, 20),
+            _row('NMPC rate constraints:', self.nmpc_rate_constraints, 20, None),
+            'NLP constants: ',
+            '-----------------------------------------------',
+            _row('nlp type:', self.nlp_type, 20),
+            _row('horizon time:', self.horizon_time, 20),
+            _row('nmpc horizon:', self.mpc_horizon, 20),
+            _row('spectral order:', self.spectral_order, 20),
+            _row('size of intervals:', self.finite_interval_size, 20),
+            _row('num intervals:', self.number_intervals, 20),
+            _row('collocation deg:', self.collocation_degree, 20),
+            _row('jit:', self.jit, 20),
+            _row('aot nlp rhs:', self.aot_nlp_rhs, 20),
+            'IPOPT settings: ',
+            '-----------------------------------------------',
+            str(self.ipopt_settings),
+        ]
+        return '\n'.join(lines)
 
-        return s
 
+# solver specific IPOPT options
+# ma57 pre allocates extra memory and uses METIS ordering (pivot order 4)
+LINEAR_SOLVER_OPTIONS = {
+    'ma27': {},
+    'ma57': {'ipopt.ma57_pre_alloc': 5.0, 'ipopt.ma57_pivot_order': 4},
+    'ma97': {},
+    'mumps': {'ipopt.mumps_mem_percent': 6000},
+}
 
 
-        
+def hsl_available():
+    return any(ctypes.util.find_library(name) for name in ('hsl', 'coinhsl'))
+
+
+# one padded 'label  value' line of the Constants printout
+def _row(label, value, width=10, pad=15):
+    if pad is None:
+        return f"{label:{width}}  {str(value)}"
+    return f"{label:{width}}  {str(value):{pad}}"
+
 
-    
\ No newline at end of file
+# Every module shares one Constants instance instead of building its own,
+# so the numpy arrays and DMs are only built once per process and
+# changes like update_from_dictionary are seen everywhere.
+@functools.lru_cache(maxsize=1)
+def get_constants():
+    return Constants()
@@ -2,16 +2,19 @@ import do_mpc
 import numpy as np
 import casadi as ca
 
-from hop.constants import Constants
+from hop.constants import get_constants
 
-mc = Constants()
+mc = get_constants()
 
 class DroneNMPCdompc:
     def __init__(self, dt, model):
         self.dt = dt
         self.model = model
         self.mpc = do_mpc.controller.MPC(self.model)
-        self.mpc.settings.nlpsol_opts = mc.ipopt_settings
+        self.mpc.settings.nlpsol_opts = mc.nlpsol_options('drone_nlp_oc')
+        # an MX model may call the compiled drone_rhs, which has no SX graph to expand into
+        if self.model.symvar_type == 'MX':
+            self.mpc.settings.nlpsol_opts['expand'] = False
         self.mpc.settings.collocation_ni = 1
         self.mpc.settings.t_step = mc.finite_interval_size    
         self.mpc.settings.n_horizon = int(mc.horizon_time / mc.finite_interval_size)
@@ -37,8 +40,11 @@ class DroneNMPCdompc:
         ]
 
         # upper and lower bounds on position (x,y,z)
-        self.mpc.bounds['lower', '_x', 'p'] = [-ca.inf, -ca.inf, 0]
-        self.mpc.bounds['upper', '_x', 'p'] = [ ca.inf,  ca.inf,  ca.inf]
+        # the rest of the state is unbounded
+        x_lower = -ca.inf * np.ones(13)
+        x_lower[2] = 0
+        self.mpc.bounds['lower', '_x', 'x'] = x_lower
+        self.mpc.bounds['upper', '_x', 'x'] = ca.inf * np.ones(13)
 
         # set max limit on each thrust motor
         control = self.model.u['u']
@@ -62,6 +68,12 @@ class DroneNMPCdompc:
     def set_waypoint(self, parameters):
         self.parameters['_p'] = parameters
 
+    # same call signature as the multiple shooter and CPS formulations.
+    # u is not needed since do-mpc keeps track of the last control itself.
+    def make_step(self, x, u, params):
+        self.set_waypoint(params)
+        return self.mpc.make_step(x)
+
     def setup_cost(self):
 
         # set up the (x,y,z, voltage, goal_thrust) as parameters
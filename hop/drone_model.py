@@ -1,20 +1,23 @@
-import numpy as np
+import functools
 import casadi as ca
-from casadi import sin, cos
 import do_mpc
 
+from hop.constants import get_constants
+from hop.equations_of_motion import Equations6DOF
+
 
 class DroneModel:
     def __init__(self, mc):
         self.mc = mc
 
-        self.model = do_mpc.model.Model('continuous' , 'SX')
-        p = self.model.set_variable(var_type='_x', var_name='p', shape=(3,1))
-        v = self.model.set_variable(var_type='_x', var_name='v', shape=(3,1))
-        q = self.model.set_variable(var_type='_x', var_name='q', shape=(4,1))
-        w = self.model.set_variable(var_type='_x', var_name='w', shape=(3,1))
+        # with the compiled drone_rhs in the NLP the model has to be MX,
+        # SX graphs can't call an external library
+        compiled = mc.compiled_nlp_rhs()
+        self.model = do_mpc.model.Model('continuous' , 'MX' if compiled else 'SX')
 
-        state = ca.vertcat(p,v,q,w)
+        # the state is one 13 vector (p, v, q, w) so do-mpc and CasADi
+        # see a single state variable instead of four stacked ones
+        state = self.model.set_variable(var_type='_x', var_name='x', shape=(13,1))
         u = self.model.set_variable(var_type='_u', var_name='u', shape=(4,1))
 
         # Parameters 
@@ -26,41 +29,17 @@ class DroneModel:
         # goal thrust
         parameters = self.model.set_variable(var_type='_p', var_name='parameters', shape=(5,1))
 
-        I_mat = ca.DM(mc.I)
-        norm_P_avg = u[2] * parameters[3] / mc.battery_v
-        F = (mc.a * norm_P_avg**2 + mc.b * norm_P_avg + mc.c) * mc.thrust_constant
-        M = mc.d * mc.Izz * u[3]
-
-        F_vector = F * ca.vertcat(
-            sin((np.pi/180)*u[1]),
-            -sin((np.pi/180)*u[0])*cos((np.pi/180)*u[1]),
-            cos((np.pi/180)*u[0])*cos((np.pi/180)*u[1])
-        )
-
-        roll_moment = ca.vertcat(0, 0, M)
-        M_vector = ca.cross(mc.moment_arm, F_vector) + roll_moment
-        angular_momentum = I_mat @ w
-
-        r_b2w = ca.vertcat(
-            ca.horzcat(1 - 2*(state[7]**2 + state[8]**2), 2*(state[6]*state[7] - state[8]*state[9]), 2*(state[6]*state[8] + state[7]*state[9])),
-            ca.horzcat(2*(state[6]*state[7] + state[8]*state[9]), 1 - 2*(state[6]**2 + state[8]**2), 2*(state[7]*state[8] - state[6]*state[9])),
-            ca.horzcat(2*(state[6]*state[8] - state[7]*state[9]), 2*(state[7]*state[8] + state[6]*state[9]), 1 - 2*(state[6]**2 + state[7]**2)),
-        )
+        # the equations of motion come from Equations6DOF so do-mpc and the other NLP
+        # formulations share one drone_rhs function. Calling it on the do-mpc symbols
+        # inlines the SX expressions into the model and one set_rhs covers the state.
+        # The compiled drone_rhs is called as a library function instead.
+        self.equations = Equations6DOF(mc)
+        rhs = self.equations.f_compiled if compiled else self.equations.f
+        self.model.set_rhs('x', rhs(state, u, parameters))
 
-        Q_omega = ca.vertcat(
-            ca.horzcat(0, state[12], -state[11], state[10]),
-            ca.horzcat(-state[12], 0, state[10], state[11]),
-            ca.horzcat(state[11], -state[10], 0, state[12]),
-            ca.horzcat(-state[10], -state[11], -state[12], 0)
-        )
-
-        q_full = state[6:10]
-        q_full = q_full / ca.norm_2(q_full)
-
-        self.model.set_rhs('p', v)
-        self.model.set_rhs('v', (r_b2w @ F_vector) / mc.m + mc.g)
-        self.model.set_rhs('q', 0.5 * Q_omega @ q_full)
-        self.model.set_rhs('w', ca.solve(I_mat, M_vector - ca.cross(w, angular_momentum)))
+        # f is a function that returns the change in state for a given state, control and parameters.
+        # With AOT turned on it is the compiled version from the codegen cache.
+        self.f = self.equations.f_compiled
 
         # build the cost function
         x_r = ca.vertcat(parameters[:3], mc.xr[3:])
@@ -75,3 +54,10 @@ class DroneModel:
         self.model.set_expression(expr_name='cost', expr=cost)
 
         self.model.setup()
+
+
+# The model only depends on the constants, so the one built from the shared
+# constants is cached. Build a DroneModel directly for modified constants.
+@functools.lru_cache(maxsize=1)
+def get_drone_model():
+    return DroneModel(get_constants())
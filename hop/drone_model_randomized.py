@@ -3,9 +3,9 @@ import casadi as ca
 from casadi import sin, cos
 import do_mpc
 
-from hop.constants import Constants
+from hop.constants import get_constants
 
-mc = Constants()
+mc = get_constants()
 
 class DroneModelRandom:
     def __init__(self):
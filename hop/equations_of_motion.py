@@ -3,6 +3,7 @@ from casadi import sin, cos
 import numpy as np
 
 from hop.constants import Constants
+from hop.codegen import compile_function
 
 # Making the equations of motion a separate class to assure that all of our NLP's 
 # use the same equations. If we change the model it happens in one place.
@@ -11,12 +12,9 @@ class Equations6DOF:
         self.mc = mc
 
         # First create our state variables and control variables
-        p = ca.SX.sym('p', 3, 1)
-        v = ca.SX.sym('v', 3, 1)
-        q = ca.SX.sym('q', 4, 1)
-        w = ca.SX.sym('w', 3, 1)
-
-        self.x = ca.vertcat(p,v,q,w)
+        # the state is one 13 vector (p, v, q, w)
+        self.x = ca.SX.sym('x', 13, 1)
+        v, w = self.x[3:6], self.x[10:13]
         self.u = ca.SX.sym('u', 4, 1)
 
         print(self.x)
@@ -32,28 +30,42 @@ class Equations6DOF:
 
         # Now we build up the equations of motion and create a function
         # for the system dynamics
-        I_mat = ca.DM(mc.I)
         norm_P_avg = self.u[2] * self.p[3] / mc.battery_v
         F = (mc.a * norm_P_avg**2 + mc.b * norm_P_avg + mc.c) * mc.thrust_constant
         M = mc.d * mc.Izz * self.u[3]
 
-        F_vector = F * ca.vertcat(
-            sin((np.pi/180)*self.u[1]),
-            -sin((np.pi/180)*self.u[0])*cos((np.pi/180)*self.u[1]),
-            cos((np.pi/180)*self.u[0])*cos((np.pi/180)*self.u[1])
-        )
+        # gimbal angles come in as degrees, convert them once and
+        # compute sin and cos of each angle only once
+        theta0 = (np.pi/180)*self.u[0]
+        theta1 = (np.pi/180)*self.u[1]
+        s0, c0 = sin(theta0), cos(theta0)
+        s1, c1 = sin(theta1), cos(theta1)
+        F_vector = F * ca.vertcat(s1, -s0*c1, c0*c1)
 
 
 
         roll_moment = ca.vertcat(0, 0, M)
+        # the cross products are left to CasADi. With the constant moment arm and
+        # inertia it already folds them down to the nonzero products, and the
+        # hand expanded version measured no smaller.
         M_vector = ca.cross(mc.moment_arm, F_vector) + roll_moment
+        # the inertia and its inverse are taken from mc.I when the model is built so
+        # a changed inertia is picked up, they are still constants in the graph
+        I_mat = ca.DM(mc.I)
+        I_inv = ca.DM(np.linalg.inv(mc.I))
         angular_momentum = I_mat @ w
 
 
+        # quaternion products shared between the rotation matrix entries
+        qx, qy, qz, qw = self.x[6], self.x[7], self.x[8], self.x[9]
+        xx, yy, zz = qx*qx, qy*qy, qz*qz
+        xy, xz, yz = qx*qy, qx*qz, qy*qz
+        wx, wy, wz = qw*qx, qw*qy, qw*qz
+
         r_b2w = ca.vertcat(
-            ca.horzcat(1 - 2*(self.x[7]**2 + self.x[8]**2), 2*(self.x[6]*self.x[7] - self.x[8]*self.x[9]), 2*(self.x[6]*self.x[8] + self.x[7]*self.x[9])),
-            ca.horzcat(2*(self.x[6]*self.x[7] + self.x[8]*self.x[9]), 1 - 2*(self.x[6]**2 + self.x[8]**2), 2*(self.x[7]*self.x[8] - self.x[6]*self.x[9])),
-            ca.horzcat(2*(self.x[6]*self.x[8] - self.x[7]*self.x[9]), 2*(self.x[7]*self.x[8] + self.x[6]*self.x[9]), 1 - 2*(self.x[6]**2 + self.x[7]**2)),
+            ca.horzcat(1 - 2*(yy + zz), 2*(xy - wz), 2*(xz + wy)),
+            ca.horzcat(2*(xy + wz), 1 - 2*(xx + zz), 2*(yz - wx)),
+            ca.horzcat(2*(xz - wy), 2*(yz + wx), 1 - 2*(xx + yy)),
         )
 
         Q_omega = ca.vertcat(
@@ -63,17 +75,26 @@ class Equations6DOF:
             ca.horzcat(-self.x[10], -self.x[11], -self.x[12], 0)
         )
 
-        q_full = self.x[6:10]
-        q_full = q_full / ca.norm_2(q_full)
+        # the quaternion norm reuses the squares from the rotation matrix and
+        # is folded into a single scale factor on the quaternion derivative
+        q_scale = 0.5 / ca.sqrt(xx + yy + zz + qw*qw)
 
         self.RHS = ca.vertcat(
             v,
             (r_b2w @ F_vector) / mc.m + mc.g,
-            0.5 * Q_omega @ q_full,
-            ca.solve(I_mat, M_vector - ca.cross(w, angular_momentum))
+            q_scale * (Q_omega @ self.x[6:10]),
+            I_inv @ (M_vector - ca.cross(w, angular_momentum))
         )
 
         # f is function that returns the change in state for a given state and control values
-        self.f = ca.Function('f', [self.x, self.u, self.p], [self.RHS])
+        # this is the single drone_rhs function every formulation (and the AOT cache) uses
+        self.f = ca.Function('drone_rhs', [self.x, self.u, self.p], [self.RHS])
+
+        # f_compiled is the same function loaded from the AOT codegen cache, used where f
+        # is evaluated numerically like the RK simulators. Without AOT, or when the
+        # compile fails, it is just f.
+        self.f_compiled = self.f
+        if mc.aot:
+            self.f_compiled = compile_function(self.f, mc.codegen_dir, flags=mc.aot_flags)
 
         
\ No newline at end of file
@@ -9,7 +9,7 @@ class DroneNMPCMultiShootTDelay:
         self.dt = self.mc.ms_time_step
         self.E = equations
         self.delay = delay * 2
-        self.N = int(self.mc.horizon_time / self.mc.ms_time_step) + self.delay
+        self.N = self.mc.mpc_horizon + self.delay
         self.record_nlp_stats = True
     
 
@@ -132,7 +132,7 @@ class DroneNMPCMultiShootTDelay:
         }
 
         # dictionary for our solver options
-        opts = self.mc.ipopt_settings
+        opts = self.mc.nlpsol_options('drone_nlp_ms_delay')
 
         self.solver = ca.nlpsol('solver', 'ipopt', nlp_prob, opts)
         
@@ -151,6 +151,8 @@ class DroneNMPCMultiShootTDelay:
         # Here we initialize our stored solution to zeros
         self.sol_x = np.zeros(self.size_x() * (self.N+1))
         self.sol_u = np.zeros(self.size_u() * (self.N - self.delay))
+        self.lam_x = np.zeros(num_vars)
+        self.lam_g = np.zeros(len(self.lbg))
         self.first_iteration = True
 
 
@@ -167,19 +169,21 @@ class DroneNMPCMultiShootTDelay:
             self.first_iteration = False
         else:
             if self.dt == 0.02:
-                x_traj = np.concatenate([self.sol_x[self.size_x():], self.sol_x[self.size_x() * self.N:]])
-                u_traj = np.concatenate([self.sol_u[self.size_u():], self.sol_u[self.size_u() * (self.N - 1):]])
-                self.init_guess = np.concatenate([x_traj, u_traj])
+                self.init_guess = self.shift_forward(np.concatenate([self.sol_x, self.sol_u]))
+                self.lam_x = self.shift_forward(self.lam_x)
             else:
                 self.init_guess = np.concatenate([self.sol_x, self.sol_u])
 
         # Call the NMPC solver 
-        sol = self.solver(x0=self.init_guess, lbx=self.lbx, ubx=self.ubx, lbg=self.lbg, ubg=self.ubg, p=x)
+        sol = self.solver(x0=self.init_guess, lam_x0=self.lam_x, lam_g0=self.lam_g,
+                          lbx=self.lbx, ubx=self.ubx, lbg=self.lbg, ubg=self.ubg, p=x)
         sol_opt = sol['x'].full().flatten()
 
         # save the solution for warm starts
         self.sol_x = sol_opt[:self.size_x() *(self.N+1)]
         self.sol_u = sol_opt[self.size_x() *(self.N+1):]
+        self.lam_x = sol['lam_x'].full().flatten()
+        self.lam_g = sol['lam_g'].full().flatten()
 
         # keep track of some accuracy measures from solving the nlp
         if self.record_nlp_stats:
@@ -193,6 +197,15 @@ class DroneNMPCMultiShootTDelay:
         return self.sol_u[:self.size_u()] # return the first control step
 
 
+    # shift a vector laid out like the optimization variables forward by one
+    # time step and repeat the last state and control. This works for the
+    # primal solution and for the bound multipliers lam_x.
+    def shift_forward(self, w):
+        n_x_vars = self.size_x() * (self.N+1)
+        x_traj, u_traj = w[:n_x_vars], w[n_x_vars:]
+        return np.concatenate([x_traj[self.size_x():], x_traj[-self.size_x():],
+                               u_traj[self.size_u():], u_traj[-self.size_u():]])
+
     def set_start_state(self, x0):
         self.x0 = x0
 
@@ -2,11 +2,13 @@ import casadi as ca
 from casadi import sin, cos
 import numpy as np
 
+from hop.codegen import compile_function
+
 
 class DroneNMPCMultiShoot:
     def __init__(self, equations):
         self.mc = equations.mc
-        self.N = int(self.mc.horizon_time / self.mc.ms_time_step)
+        self.N = self.mc.mpc_horizon
         self.dt = self.mc.ms_time_step
         self.E = equations
         self.record_nlp_stats = False
@@ -15,16 +17,28 @@ class DroneNMPCMultiShoot:
     # In this function we build up the NMPC problem instance
     def build_nmpc_instance(self):
 
-        X0 = ca.SX.sym('X0', self.size_x())   # these are variables representing our initial state
-        U0 = ca.SX.sym('U0', self.size_u())
-        
-        P0 = ca.vertcat(X0, U0, self.E.p)
+        # With AOT on, the RK4 step and its derivatives are loaded from the codegen cache.
+        # JIT compiles the whole NLP instead and cannot link against the cached library,
+        # so with JIT on the step stays symbolic.
+        compiled = self.mc.aot and not self.mc.jit
+
+        # With a compiled step or a parallel map the NLP is built from MX symbols so the
+        # mapped RK4 call stays one node that IPOPT's callbacks evaluate natively or
+        # across threads. Otherwise we keep the plain SX formulation.
+        mx = compiled or self.mc.ms_map_parallelization != 'serial'
+        sym = ca.MX.sym if mx else ca.SX.sym
+
+        X0 = sym('X0', self.size_x())   # these are variables representing our initial state
+        U0 = sym('U0', self.size_u())
+        self.p = sym('parameters', self.E.p.size1())
+
+        P0 = ca.vertcat(X0, U0, self.p)
 
         # we make a copy of the state variables for each N+1 time steps
-        X = ca.SX.sym('X', self.size_x(), self.N+1)    
+        X = sym('X', self.size_x(), self.N+1)
 
         # we make a copy of the control variables for each N time steps
-        U = ca.SX.sym('U', self.size_u(), self.N)       
+        U = sym('U', self.size_u(), self.N)
 
         # We make one long list of all the optimization variables
         # all the state variables preceed all the control variables.
@@ -55,8 +69,20 @@ class DroneNMPCMultiShoot:
 
         self.cost = 0.0
 
-        x_r = ca.vertcat(self.E.p[:3], self.mc.xr[3:])
-        u_r = ca.vertcat(0.0, 0.0, self.E.p[4] * self.mc.battery_v / self.E.p[3], 0.0)
+        x_r = ca.vertcat(self.p[:3], self.mc.xr[3:])
+        u_r = ca.vertcat(0.0, 0.0, self.p[4] * self.mc.battery_v / self.p[3], 0.0)
+
+        # here we create the constraints that require the solution
+        # to obey our system dynamics. We use Runge Kutta integration
+        # and for each time step, we create a constraint that requires
+        # the state at time k+1 to equal the system dynamics applied to the
+        # the state at time k. One RK4 step function is mapped over all
+        # shooting nodes so it is evaluated in a single call.
+        rk4 = self.rk4_step()
+        if compiled:
+            rk4 = compile_function(rk4, self.mc.codegen_dir, flags=self.mc.aot_flags)
+        rk4 = rk4.map(self.N, self.mc.ms_map_parallelization, self.mc.ms_map_threads)
+        X_next_RK4 = rk4(X[:, :self.N], U, ca.repmat(self.p, 1, self.N), ca.DM.ones(1, self.N) * self.dt)
 
         for k in range(self.N):
             x_k = X[:, k]    # state at time step k
@@ -68,18 +94,9 @@ class DroneNMPCMultiShoot:
             control_cost = (u_k - u_r).T @ self.mc.R @ (u_k - u_r)
             self.cost = self.cost + state_error_cost + control_cost
 
-            # here we create the constraints that require the solution
-            # to obey our system dynamics. We use Runge Kutta integration
-            # and for each time step, we create a constraint that requires
-            # the state at time k+1 to equal the system dynamics applied to the 
-            # the state at time k.
+            # dynamics constraint for this time step
             next_state = X[:, k+1]
-            k1 = self.E.f(x_k, u_k, self.E.p)
-            k2 = self.E.f(x_k + self.dt/2*k1, u_k, self.E.p)
-            k3 = self.E.f(x_k + self.dt/2*k2, u_k, self.E.p)
-            k4 = self.E.f(x_k + self.dt * k3, u_k, self.E.p)
-            next_state_RK4 = x_k + (self.dt / 6) * (k1 + 2 * k2 + 2 * k3 + k4)
-            g = ca.vertcat(g, next_state - next_state_RK4)
+            g = ca.vertcat(g, next_state - X_next_RK4[:, k])
             self.lbg += [0.0]*int(next_state.numel())
             self.ubg += [0.0]*int(next_state.numel())
 
@@ -119,7 +136,11 @@ class DroneNMPCMultiShoot:
         }
 
         # dictionary for our solver options
-        opts = self.mc.ipopt_settings
+        # expanding the MX graph to SX would inline the map again and
+        # the compiled step has no SX expression to expand into
+        opts = self.mc.nlpsol_options(f'drone_nlp_ms{self.N}')
+        if mx:
+            opts = dict(opts, expand=False)
 
         self.solver = ca.nlpsol('solver', 'ipopt', nlp_prob, opts)
         
@@ -138,6 +159,8 @@ class DroneNMPCMultiShoot:
         # Here we initialize our stored solution to zeros
         self.sol_x = np.zeros(self.size_x() * (self.N+1))
         self.sol_u = np.zeros(self.size_u() * self.N)
+        self.lam_x = np.zeros(num_vars)
+        self.lam_g = np.zeros(len(self.lbg))
         self.first_iteration = True
 
 
@@ -154,23 +177,25 @@ class DroneNMPCMultiShoot:
             self.first_iteration = False
         else:
             if self.dt == 0.02:
-                x_traj = np.concatenate([self.sol_x[self.size_x():], self.sol_x[self.size_x() * self.N:]])
-                u_traj = np.concatenate([self.sol_u[self.size_u():], self.sol_u[self.size_u() * (self.N - 1):]])
-                self.init_guess = np.concatenate([x_traj, u_traj])
+                self.init_guess = self.shift_forward(np.concatenate([self.sol_x, self.sol_u]))
+                self.lam_x = self.shift_forward(self.lam_x)
             else:
                 self.init_guess = np.concatenate([self.sol_x, self.sol_u])
 
         # Call the NMPC solver 
-        sol = self.solver(x0=self.init_guess, lbx=self.lbx, ubx=self.ubx, lbg=self.lbg, ubg=self.ubg, p=x)
+        sol = self.solver(x0=self.init_guess, lam_x0=self.lam_x, lam_g0=self.lam_g,
+                          lbx=self.lbx, ubx=self.ubx, lbg=self.lbg, ubg=self.ubg, p=x)
         sol_opt = sol['x'].full().flatten()
 
         # save the solution for warm starts
         self.sol_x = sol_opt[:self.size_x() *(self.N+1)]
         self.sol_u = sol_opt[self.size_x() *(self.N+1):]
+        self.lam_x = sol['lam_x'].full().flatten()
+        self.lam_g = sol['lam_g'].full().flatten()
 
         # keep track of some accuracy measures from solving the nlp
         if self.record_nlp_stats:
-            f_fun = ca.Function("f_fun", [self.opt_vars, self.E.p], [self.cost])
+            f_fun = ca.Function("f_fun", [self.opt_vars, self.p], [self.cost])
             cost = float(f_fun(sol_opt, params))
             self.solver_stats = {
                 'status': self.solver.stats()['return_status'], 
@@ -180,6 +205,28 @@ class DroneNMPCMultiShoot:
         return self.sol_u[:self.size_u()] # return the first control step
 
 
+    # one Runge Kutta 4 step of the system dynamics as a function.
+    # The step size is an input rather than baked in, so one compiled
+    # library serves every time step the experiments sweep over.
+    def rk4_step(self):
+        x, u, p = self.E.x, self.E.u, self.E.p
+        dt = ca.SX.sym('dt')
+        k1 = self.E.f(x, u, p)
+        k2 = self.E.f(x + dt/2*k1, u, p)
+        k3 = self.E.f(x + dt/2*k2, u, p)
+        k4 = self.E.f(x + dt * k3, u, p)
+        x_next = x + (dt / 6) * (k1 + 2 * k2 + 2 * k3 + k4)
+        return ca.Function('rk4_step', [x, u, p, dt], [x_next])
+
+    # shift a vector laid out like the optimization variables forward by one
+    # time step and repeat the last state and control. This works for the
+    # primal solution and for the bound multipliers lam_x.
+    def shift_forward(self, w):
+        n_x_vars = self.size_x() * (self.N+1)
+        x_traj, u_traj = w[:n_x_vars], w[n_x_vars:]
+        return np.concatenate([x_traj[self.size_x():], x_traj[-self.size_x():],
+                               u_traj[self.size_u():], u_traj[-self.size_u():]])
+
     def set_start_state(self, x0):
         self.x0 = x0
 
@@ -4,22 +4,21 @@ import casadi as ca
 from casadi import sin, cos
 from time import sleep
 
-from hop.drone_model import DroneModel
-from hop.dompc import DroneNMPCdompc
+from hop.nmpc_factory import build_nmpc
 from hop.offboard_node import OffBoardNode
 from hop.utilities import distance
-from hop.constants import Constants
-mc = Constants()
+from hop.constants import get_constants
+mc = get_constants()
 
 class NMPC(OffBoardNode):
 
     def __init__(self):
         super().__init__('nmpc_controller', timelimit=100, dt=mc.dt)
 
-        self.model = DroneModel(mc)
-        self.mpc = DroneNMPCdompc(mc.dt, self.model.model)
-        self.mpc.setup_cost()
-        self.mpc.set_start_state(mc.x0)
+        # the solver is only built once per flight, so the JIT compile is
+        # paid at start up and every solve in the loop runs native code
+        mc.jit = True
+        self.mpc = build_nmpc(mc.x0)
         self.acheive_logged = False
         self.unpowered_mode = False
 
@@ -35,9 +34,10 @@ class NMPC(OffBoardNode):
             self.get_logger().info('new waypoint ' + str(mc.waypoints[self.waypoint_i][:3]))
         elif self.key == 'l':
             self.key = ''
-            land = np.array([self.state[0], self.state[1], 0.0])
-            self.mpc.set_waypoint(mc.land)
-            self.get_logger().info('landing ' + str(land))
+            # the current waypoint holds the NMPC parameters and is sent every tick,
+            # so the landing target replaces it instead of being set on the solver
+            mc.waypoints[self.waypoint_i] = mc.land.copy()
+            self.get_logger().info('landing ' + str(mc.land[:3]))
         elif not self.key == '':
             self.pwm_motors = [0.0, 0.0]
             self.run_motors()
@@ -57,8 +57,7 @@ class NMPC(OffBoardNode):
             # if True:
             #     sleep(0.015)
             # else:
-            self.mpc.set_waypoint(mc.waypoints[self.waypoint_i])
-            control = self.mpc.mpc.make_step(self.state)
+            control = self.mpc.make_step(self.state, self.control, mc.waypoints[self.waypoint_i])
             self.control = np.array(control).flatten()
             self.control_translator()   
 
@@ -0,0 +1,32 @@
+from hop.constants import get_constants
+from hop.drone_model import get_drone_model
+from hop.dompc import DroneNMPCdompc
+from hop.multiShooting import DroneNMPCMultiShoot
+from hop.chebyshev_ps import DroneNMPCwithCPS
+
+
+# Builds the NMPC for the formulation in mc.nlp_type (or nlp_type if given) and
+# sets its start state. Every formulation gets its dynamics from the same
+# drone_rhs function of the shared drone model, and the returned controller is
+# always called as make_step(x, u, params). With mc.aot_nlp_rhs on, oc and cps
+# call the model's compiled drone_rhs library, the same one the RK simulators use,
+# and ms builds its compiled RK4 step from that drone_rhs.
+def build_nmpc(x0, nlp_type=None):
+    mc = get_constants()
+    nlp_type = mc.nlp_type if nlp_type is None else nlp_type
+    model = get_drone_model()
+
+    if nlp_type == 'oc':
+        nmpc = DroneNMPCdompc(mc.dt, model.model)
+        nmpc.setup_cost()
+    elif nlp_type == 'cps':
+        nmpc = DroneNMPCwithCPS(model.equations)
+        nmpc.build_nmpc_instance()
+    elif nlp_type == 'ms':
+        nmpc = DroneNMPCMultiShoot(model.equations)
+        nmpc.build_nmpc_instance()
+    else:
+        raise ValueError(f'unknown nlp type {nlp_type}')
+
+    nmpc.set_start_state(x0)
+    return nmpc
@@ -6,12 +6,12 @@ from time import perf_counter
 from casadi import DM
 import numpy as np
 from scipy.spatial.transform import Rotation as R
-from hop.constants import Constants
+from hop.constants import get_constants
 from hop.utilities import output_data, quaternion_multiply
 from datetime import datetime
 from math import sqrt
 from copy import deepcopy
-mc = Constants()
+mc = get_constants()
 
 # this is all needed for keyboard input
 import sys
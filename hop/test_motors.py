@@ -1,7 +1,7 @@
 import rclpy
 from hop.offboard_node import OffBoardNode
-from hop.constants import Constants
-mc = Constants()
+from hop.constants import get_constants
+mc = get_constants()
 
 class TestMotors(OffBoardNode):
 
@@ -1,8 +1,8 @@
 import rclpy
 from hop.offboard_node import OffBoardNode
-from hop.constants import Constants
+from hop.constants import get_constants
 from gpiozero import LED
-mc = Constants()
+mc = get_constants()
 from numpy import clip  
 
 class TestServos(OffBoardNode):
@@ -16,5 +16,11 @@
 # # experiments that compare the three NLP encodings
 # from experiments import nlp_experiment
 
+# experiments that compare the IPOPT linear solvers
+# from experiments import linear_solver_experiment
+
+# experiments that sweep the multiple shooter horizon length
+# from experiments import horizon_experiment
+
 # experiments that look at control time delays
 from experiments import time_delay
\ No newline at end of file
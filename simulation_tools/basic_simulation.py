@@ -6,10 +6,9 @@
 #
 
 
-from hop.drone_model import DroneModel
-from hop.multiShooting import DroneNMPCMultiShoot
+from hop.drone_model import get_drone_model
 from hop.dompc import DroneNMPCdompc
-from hop.constants import Constants
+from hop.constants import get_constants
 from do_mpc.simulator import Simulator
 from utilities import import_data
 import casadi as ca
@@ -23,7 +22,7 @@ from plotting.plots import plot_comparison, plot_state_for_paper, plot_control_f
 from hop.utilities import sig_figs
 from tools.animation import RocketAnimation
 from simulation_tools.integrators import RKSimulator
-mc = Constants()
+mc = get_constants()
 
 
 test_list = import_data('./nmpc_test_cases.json')  
@@ -107,7 +106,7 @@ for test in test_list:
 
     # run fine grained solver for a reference trajectory
     # the accuracy of other runs are assessed relative to this trajectory
-    model = DroneModel(mc)
+    model = get_drone_model()
     mpc = DroneNMPCdompc(mc.dt, model.model)
 
     # dompc simulator
@@ -130,7 +129,6 @@ for test in test_list:
     # estimator.x0 = x_init
 
     # set up the Runge-Kutta simulator
-    ms_model = DroneNMPCMultiShoot(mc)
     rk_sim = RKSimulator(0.005, 4)
 
     mpc.setup_cost()
@@ -157,7 +155,7 @@ for test in test_list:
         #     x0 = estimator.make_step(y_next)
 
         # runge kutta 4 simulator
-        x0 = rk_sim.make_step(ms_model.f, x0, u0, parameters)
+        x0 = rk_sim.make_step(model.f, x0, u0, parameters)
   
         state_data[k] = np.reshape(x0, (13,))
         control_data[k] = np.reshape(u0, (4,))